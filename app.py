@@ -1,30 +1,73 @@
 #!/usr/bin/env python3
 # app.py with OAuth 2.0 implementation
 
-from flask import Flask, request, jsonify, send_file, abort, redirect, url_for, session
-from flask_cors import CORS
+from flask import Flask, request, jsonify, send_file, abort, redirect, url_for, session, g, render_template, make_response, Response, stream_with_context
 import os
-import json
-import tempfile
+import logging
+import msgspec
 import qrcode
-from PIL import Image, ImageDraw, ImageFont
+try:
+    # Optional C-backed encoder (libqrencode); 1-2 orders of magnitude
+    # faster than pure-Python qrcode for matrix construction
+    import qrencode
+except ImportError:
+    qrencode = None
+from PIL import Image, ImageDraw, ImageFont, ImageOps
 import io
 import uuid
-import traceback
+import time
+import copy
+import hashlib
+import threading
+import queue
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import cachetools
+import cachelib
 from datetime import datetime
 import requests
 import sqlite3
 from sqlite3 import Error
+import sqlalchemy.pool as pool
+from sqlalchemy import event
 import os.path
 from datetime import timedelta
 # Google OAuth libraries
 from google_auth_oauthlib.flow import Flow
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload, MediaIoBaseDownload
+from googleapiclient.discovery import build_from_document
+from googleapiclient import discovery_cache
+from googleapiclient.http import MediaIoBaseUpload, MediaIoBaseDownload
 from flask_session import Session
+from flask.sessions import SessionInterface, NullSession
+from flask.json.provider import JSONProvider
+
+class MsgspecJSONProvider(JSONProvider):
+    """JSON provider backed by msgspec (much faster than stdlib json).
+
+    msgspec natively handles datetime, date, uuid and dataclasses, which
+    covers everything the routes pass to jsonify().
+    """
+
+    def dumps(self, obj, **kwargs):
+        return msgspec.json.encode(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        try:
+            return msgspec.json.decode(s)
+        except msgspec.DecodeError as e:
+            # Flask's get_json() only treats ValueError as a parse
+            # failure (400 / silent=None); DecodeError is not one
+            raise ValueError(str(e)) from e
 
 app = Flask(__name__)
+app.json = MsgspecJSONProvider(app)
+
+# Logging: lazy %s formatting so debug messages cost nothing unless the
+# level is enabled (set LOG_LEVEL=DEBUG to see per-request tracing)
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper())
+log = app.logger
 
 # Use a stable secret so session cookies (and OAuth state) persist across reloads
 app.secret_key = os.environ.get("FLASK_SECRET_KEY", "dev-only-change-me")
@@ -40,14 +83,22 @@ BACKEND_ORIGIN  = os.environ.get("BACKEND_ORIGIN",  "http://localhost:5000")
 GOOGLE_CALLBACK_URL = os.environ.get("GOOGLE_CALLBACK_URL", f"{BACKEND_ORIGIN}/auth/google/callback")
 CALLBACK_URL    = os.environ.get("GOOGLE_CALLBACK_URL", f"{BACKEND_ORIGIN}/auth/google/callback")
 
-# CORS: allow specific origins with credentials
-CORS(
-    app,
-    resources={r"/*": {"origins": ["http://localhost:8001", "http://localhost:3000", "http://localhost:5000"]}},
-    supports_credentials=True,
-    allow_headers=["Content-Type", "Authorization", "X-Requested-With"],
-    methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-)
+# CORS: allow specific origins with credentials. A fixed origin set needs
+# no per-request regex matching, so a minimal after_request hook replaces
+# the flask_cors machinery
+ALLOWED_ORIGINS = frozenset({"http://localhost:8001", "http://localhost:3000", "http://localhost:5000"})
+
+@app.after_request
+def add_cors_headers(resp):
+    origin = request.headers.get('Origin')
+    if origin in ALLOWED_ORIGINS:
+        resp.headers['Access-Control-Allow-Origin'] = origin
+        resp.headers['Access-Control-Allow-Credentials'] = 'true'
+        resp.headers.add('Vary', 'Origin')
+        if request.method == 'OPTIONS':
+            resp.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization, X-Requested-With'
+            resp.headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'
+    return resp
 
 # Make sure cookies are set properly
 app.config.update(
@@ -65,23 +116,306 @@ SCOPES = ['https://www.googleapis.com/auth/drive']
 API_SERVICE_NAME = 'drive'
 API_VERSION = 'v3'
 
-
-# Configure session to use filesystem
-app.config['SESSION_TYPE'] = 'filesystem'
-app.config['SESSION_FILE_DIR'] = os.path.join(os.getcwd(), 'flask_session')
+# The bundled Drive discovery document (~170KB of JSON) is parsed once
+# here; every service build reuses the dict instead of re-reading and
+# re-parsing it
+_DRIVE_DISCOVERY = msgspec.json.decode(
+    discovery_cache.get_static_doc(API_SERVICE_NAME, API_VERSION))
+
+
+# Session backend: filesystem by default (safe across gunicorn workers
+# on one host); SESSION_TYPE=cachelib swaps in an in-memory SimpleCache
+# for single-process runs, dropping the per-request pickle write/fsync
+app.config['SESSION_TYPE'] = os.environ.get('SESSION_TYPE', 'filesystem')
+if app.config['SESSION_TYPE'] == 'cachelib':
+    app.config['SESSION_CACHELIB'] = cachelib.SimpleCache()
+else:
+    app.config['SESSION_FILE_DIR'] = os.path.join(os.getcwd(), 'flask_session')
 app.config['SESSION_PERMANENT'] = True
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=7)
 Session(app)
 
+# Paths that never read or write the session; skip the per-request
+# session file load/save entirely for them. /api/status stays out of
+# this set: its 'authenticated' field comes from the session
+SESSION_BYPASS_PATHS = frozenset({'/', '/auth-success'})
+
+class SessionBypassInterface(SessionInterface):
+    """Delegate to the real session interface, except for session-free paths"""
+
+    def __init__(self, wrapped, paths, prefixes):
+        self.wrapped = wrapped
+        self.paths = paths
+        self.prefixes = tuple(prefixes)
+
+    def open_session(self, app, request):
+        if request.path in self.paths or request.path.startswith(self.prefixes):
+            return self.make_null_session(app)
+        return self.wrapped.open_session(app, request)
+
+    def save_session(self, app, session, response):
+        if isinstance(session, NullSession):
+            return
+        self.wrapped.save_session(app, session, response)
+
+app.session_interface = SessionBypassInterface(
+    app.session_interface,
+    SESSION_BYPASS_PATHS,
+    [(app.static_url_path or '/static') + '/'],
+)
+
 # At the top of your file, outside any route
-OAUTH_STATES = {}
+# Insertion-ordered so the oldest state can be evicted in O(1) when full
+OAUTH_STATES = OrderedDict()
+MAX_STATES = 10000
+STATE_TTL = 600  # seconds a pending OAuth state stays valid
+STATE_CLEANUP_INTERVAL = 60  # seconds
+
+def _state_cleanup_loop():
+    """Periodically drop expired/used OAuth states"""
+    while True:
+        time.sleep(STATE_CLEANUP_INTERVAL)
+        try:
+            clean_old_states()
+        except Exception as e:
+            log.warning("Error cleaning OAuth states: %s", e)
+
+_state_cleanup_thread = threading.Thread(target=_state_cleanup_loop, daemon=True)
+_state_cleanup_thread.start()
 
-os.makedirs(app.config['SESSION_FILE_DIR'], exist_ok=True)
+if 'SESSION_FILE_DIR' in app.config:
+    os.makedirs(app.config['SESSION_FILE_DIR'], exist_ok=True)
 
 # Create QR codes directory if it doesn't exist
 if not os.path.exists(QR_CODES_DIR):
     os.makedirs(QR_CODES_DIR)
-    print(f"Created directory: {QR_CODES_DIR}")
+    log.info("Created directory: %s", QR_CODES_DIR)
+
+# Label fonts are loaded once per size instead of per request; FreeType
+# measurement/drawing through a shared font object is thread-safe
+@lru_cache(maxsize=8)
+def _load_font(size):
+    for font_name in ("DejaVuSans.ttf", "Arial.ttf", "Arial"):
+        try:
+            font = ImageFont.truetype(font_name, size)
+            log.info("Loaded label font: %s (size=%s)", font_name, size)
+            return font
+        except Exception:
+            continue
+    log.info("Falling back to default PIL label font")
+    return ImageFont.load_default()
+
+_LABEL_FONT = _load_font(16)
+
+# Word widths are stable for a given font, and site names/locations repeat
+# across submissions; cache the FreeType shaping results
+@lru_cache(maxsize=8192)
+def _word_width(font, word):
+    return font.getlength(word)
+
+@lru_cache(maxsize=16)
+def _space_width(font):
+    return font.getlength(" ")
+
+@lru_cache(maxsize=16)
+def _font_line_height(font):
+    bbox = font.getbbox("Ag")
+    return bbox[3] - bbox[1]
+
+def wrap_text_fast(font, text, max_width):
+    """Greedy word wrap on running widths: at most one cached
+    font.getlength() call per word instead of re-measuring every prefix
+    of the current line.
+
+    Returns (line, width) pairs so the drawing phase can center lines
+    without re-shaping them through FreeType."""
+    if not text:
+        return []
+    space_w = _space_width(font)
+    lines, cur_words = [], []
+    cur_width = 0.0
+    for word in text.split():
+        word_w = _word_width(font, word)
+        new_width = word_w if not cur_words else cur_width + space_w + word_w
+        if new_width <= max_width or not cur_words:
+            cur_words.append(word)
+            cur_width = new_width
+        else:
+            lines.append((" ".join(cur_words), cur_width))
+            cur_words = [word]
+            cur_width = word_w
+    if cur_words:
+        lines.append((" ".join(cur_words), cur_width))
+    return lines
+
+# Cache of blank QRCode templates so the version/timing/format module
+# setup is not redone on every request; deep-copied before use
+_QR_TEMPLATE_CACHE = {}
+
+# Encoded PNG bytes by filename; lets /qrcodes/<filename> serve straight
+# from RAM instead of re-reading a file that was just written
+_QR_PNG_CACHE = cachetools.LRUCache(maxsize=1024)
+
+# Parsed template JSON keyed by (fileId, modifiedTime); the list call
+# returns modifiedTime for free, so a hit means the content on Drive is
+# unchanged and the download + parse can be skipped
+_TEMPLATE_CACHE = cachetools.LRUCache(maxsize=512)
+
+# PNG encode + disk write happen off the request thread: the response
+# only needs the URL, and zlib releases the GIL so encodes parallelize.
+# A GET that races the encode falls back to the disk path (and the task
+# normally finishes well before the client turns the URL around)
+_IO_POOL = ThreadPoolExecutor(max_workers=4)
+
+# Shared pool for fanning out independent Drive round-trips (metadata +
+# media, parallel template fetches). Network-bound work, so workers
+# spend their time blocked on sockets, not the GIL
+_NET_POOL = ThreadPoolExecutor(max_workers=16)
+
+# Pool workers keep one Drive service each (googleapiclient http objects
+# are not thread-safe, so they cannot share the g-cached one); keyed by
+# access token so a refresh invalidates the cached service
+_thread_services = threading.local()
+
+def _thread_drive_service(credentials):
+    cached = getattr(_thread_services, 'svc', None)
+    if cached is not None and cached[0] == credentials.token:
+        return cached[1]
+    svc = build_from_document(_DRIVE_DISCOVERY, credentials=credentials)
+    _thread_services.svc = (credentials.token, svc)
+    return svc
+
+def _encode_and_store_png(img, filename, path):
+    """Encode img to PNG, populate the RAM cache, and land it on disk
+    atomically so concurrent requests never see a partial file"""
+    # The route has already returned the URL by the time this runs, so a
+    # failure here would otherwise vanish with the Future — log it
+    try:
+        buf = io.BytesIO()
+        # QR + label are pure black/white: packing to 1-bit cuts the raw
+        # pixel data 8x before deflate even starts, and level 1 is plenty
+        # for content this regular
+        img = img.convert("1", dither=Image.NONE)
+        img.save(buf, format="PNG", optimize=False, compress_level=1)
+        data = buf.getvalue()
+        _QR_PNG_CACHE[filename] = data
+        tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        log.exception("Failed to encode/store QR PNG %s", path)
+
+@lru_cache(maxsize=256)
+def _render_label_strip(site_name, site_location, width):
+    """Render the name/location caption as a small grayscale strip.
+
+    The strip is drawn once per (name, location, width) and cached;
+    composing a labelled QR becomes two pastes. Never mutate the
+    returned image — it is shared across requests."""
+    font = _LABEL_FONT
+    text_max_w = width - 20  # 10px side padding
+
+    name_lines = wrap_text_fast(font, site_name, text_max_w)
+    loc_lines = wrap_text_fast(font, site_location, text_max_w)
+
+    lh = _font_line_height(font) or 16
+    pad_top = 10
+    gap = 6
+    block_gap = 12 if (name_lines and loc_lines) else 0
+    text_h = (pad_top
+              + len(name_lines) * (lh + gap)
+              + (block_gap if (name_lines and loc_lines) else 0)
+              + len(loc_lines) * (lh + gap)
+              + 10)  # bottom pad
+
+    strip = Image.new("L", (width, max(60, text_h)), 255)
+    draw = ImageDraw.Draw(strip)
+    cursor_y = pad_top
+
+    def draw_centered(lines):
+        nonlocal cursor_y
+        for line, w in lines:
+            x = max(10, int(width - w) // 2)
+            draw.text((x, cursor_y), line, fill=0, font=font)
+            cursor_y += lh + gap
+
+    if name_lines:
+        draw_centered(name_lines)
+    if name_lines and loc_lines:
+        cursor_y += max(0, block_gap - gap)
+    if loc_lines:
+        draw_centered(loc_lines)
+
+    return strip
+
+def _qr_matrix_to_image(qr, box_size, border):
+    """Render a made QRCode's module matrix into a grayscale PIL image.
+
+    make_image() draws one rectangle per dark module from Python;
+    frombytes + NEAREST resize + border expand do the same work as three
+    C-level calls, with only a tiny n*n byte pass in Python."""
+    modules = qr.modules
+    n = len(modules)
+    raw = bytes(0 if cell else 255 for row in modules for cell in row)
+    img = Image.frombytes('L', (n, n), raw)
+    img = img.resize((n * box_size, n * box_size), Image.NEAREST)
+    return ImageOps.expand(img, border=border * box_size, fill=255)
+
+def get_qr_template(version, error_correction, box_size, border, mask_pattern=None):
+    """Return a fresh QRCode built from a cached blank template"""
+    key = (version, error_correction, box_size, border, mask_pattern)
+    template = _QR_TEMPLATE_CACHE.get(key)
+    if template is None:
+        template = qrcode.QRCode(
+            version=version,
+            error_correction=error_correction,
+            box_size=box_size,
+            border=border,
+            mask_pattern=mask_pattern,
+        )
+        _QR_TEMPLATE_CACHE[key] = template
+    return copy.deepcopy(template)
+
+def _compose_labeled_qr(payload, site_name, site_location):
+    """Compose the labelled QR image: QR on top, caption strip below.
+
+    Single rendering pipeline shared by the standalone QR route and site
+    creation, so every encoder tweak (fixed mask, frombytes rendering,
+    cached strip, optional qrencode fast path) applies to both."""
+    if qrencode is not None:
+        # C-backed fast path; qrencode emits the bare matrix, so add the
+        # 4-module quiet zone the spec requires (matches the fallback)
+        _, size, qr_img = qrencode.encode(payload, level=qrencode.QR_ECLEVEL_L)
+        qr_img = qr_img.resize((size * 10, size * 10), Image.NEAREST)
+        qr_img = ImageOps.expand(qr_img, border=4 * 10, fill=255)
+    else:
+        # Fixed mask skips scoring all 8 patterns in make(), the dominant
+        # encoder cost when fit=True bumps the version for long links
+        qr = get_qr_template(
+            version=1,
+            error_correction=qrcode.constants.ERROR_CORRECT_L,
+            box_size=10,
+            border=4,
+            mask_pattern=0,
+        )
+        qr.add_data(payload)
+        qr.make(fit=True)
+
+        # Matrix rendered via C-level frombytes/resize, not per-module
+        # rectangle drawing
+        qr_img = _qr_matrix_to_image(qr, box_size=10, border=4)
+
+    # Grayscale is enough for QR + black label text; "L" moves a third
+    # of the bytes RGB would through the compositing pipeline
+    qr_img = qr_img.convert("L")
+    qr_w, qr_h = qr_img.size
+
+    strip = _render_label_strip(site_name, site_location, qr_w)
+    out = Image.new("L", (qr_w, qr_h + strip.height), 255)
+    out.paste(qr_img, (0, 0))
+    out.paste(strip, (0, qr_h))
+    return out
 
 # Helper function to get credentials from session
 def get_credentials():
@@ -100,34 +434,101 @@ def get_credentials():
 
 # Helper function to build the Drive service
 def get_drive_service():
+    # Reuse the service already built for this request; several routes
+    # call this helper more than once per request
+    service = getattr(g, '_drive_service', None)
+    if service is not None:
+        return service
+
     credentials = get_credentials()
     if not credentials:
         return None
-    
-    return build(API_SERVICE_NAME, API_VERSION, credentials=credentials)
+
+    # Built from the pre-parsed discovery document; no HTTP fetch and no
+    # per-build JSON parse
+    service = build_from_document(_DRIVE_DISCOVERY, credentials=credentials)
+    g._drive_service = service
+    return service
+
+# The acting user's email only changes when the credentials change; cache
+# it per access token so audit logging does not cost a Drive about()
+# round trip on every site mutation
+_USER_EMAIL_CACHE = cachetools.TTLCache(maxsize=1024, ttl=3600)
+
+def get_user_email():
+    """Email of the authenticated user, skipping the Drive RTT when possible"""
+    user_info = session.get('user_info')
+    if user_info and user_info.get('emailAddress'):
+        return user_info['emailAddress']
+
+    credentials = get_credentials()
+    if not credentials:
+        return None
+
+    email = _USER_EMAIL_CACHE.get(credentials.token)
+    if email is None:
+        about = get_drive_service().about().get(fields='user').execute()
+        email = about.get('user', {}).get('emailAddress')
+        if email:
+            _USER_EMAIL_CACHE[credentials.token] = email
+    return email
 
 # Database setup
 DATABASE_FILE = os.environ.get('DATABASE_FILE', 'sites.db')
 
+def _getconn():
+    """Connection factory for the pool"""
+    # A larger statement cache keeps the VDBE programs for all the hot
+    # CRUD statements compiled across requests (default is 128)
+    conn = sqlite3.connect(DATABASE_FILE, check_same_thread=False,
+                           isolation_level=None, cached_statements=200)
+    conn.row_factory = sqlite3.Row  # This enables column access by name
+    return conn
+
+# Bounded pool of SQLite connections shared across requests
+app.db_pool = pool.QueuePool(_getconn, pool_size=5, max_overflow=10, recycle=3600)
+
+@event.listens_for(app.db_pool, 'connect')
+def _set_sqlite_pragmas(dbapi_conn, connection_record):
+    """Apply per-connection PRAGMAs once, when the pool opens a connection"""
+    dbapi_conn.execute("PRAGMA journal_mode=WAL")
+    dbapi_conn.execute("PRAGMA synchronous=NORMAL")
+    dbapi_conn.execute("PRAGMA temp_store=MEMORY")
+    dbapi_conn.execute("PRAGMA mmap_size=268435456")  # 256 MB
+    dbapi_conn.execute("PRAGMA cache_size=-65536")    # 64 MB page cache
+    dbapi_conn.execute("PRAGMA busy_timeout=30000")   # back off instead of raising on writer contention
+    dbapi_conn.execute("PRAGMA foreign_keys=ON")
+
 def get_db_connection():
-    """Create a connection to the SQLite database"""
-    conn = None
+    """Check a pooled SQLite connection out for the current app context"""
+    db = getattr(g, '_db', None)
+    if db is not None:
+        return db
     try:
-        conn = sqlite3.connect(DATABASE_FILE)
-        conn.row_factory = sqlite3.Row  # This enables column access by name
-        return conn
+        db = app.db_pool.connect()
+        g._db = db
+        return db
     except Error as e:
-        print(f"Error connecting to database: {e}")
-        if conn:
-            conn.close()
+        log.error("Error connecting to database: %s", e)
         return None
 
+@app.teardown_appcontext
+def close_db_connection(exception):
+    """Close the per-context database connection, if one was opened"""
+    db = g.pop('_db', None)
+    if db is not None:
+        db.close()
+
 def init_db():
     """Initialize the database with required tables"""
+    with app.app_context():
+        return _init_db_tables()
+
+def _init_db_tables():
     conn = get_db_connection()
     if conn is None:
         return False
-    
+
     try:
         cursor = conn.cursor()
         
@@ -147,15 +548,76 @@ def init_db():
             created_by TEXT
         )
         ''')
-        
+
+        # Index to serve the created_at DESC ordering on /api/sites without a sort
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_sites_created_at ON sites(created_at DESC)
+        ''')
+
+        # Hot lookup columns: per-user filtering, recency ordering, and
+        # reverse lookups from a QR id back to its site
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_sites_created_by ON sites(created_by)
+        ''')
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_sites_updated_at ON sites(updated_at DESC)
+        ''')
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_sites_qr_id ON sites(qr_id)
+        ''')
+        # Refresh planner stats so the new indexes actually get picked
+        cursor.execute('ANALYZE')
+
         conn.commit()
-        print("Database initialized successfully")
+        log.info("Database initialized successfully")
+        return True
+    except Error as e:
+        log.error("Error initializing database: %s", e)
+        return False
+
+# Explicit column order shared by the listing SQL and the row->dict zip
+SITE_COLS = ('id', 'name', 'location', 'folder_type', 'folder_link', 'description',
+             'qr_url', 'qr_id', 'created_at', 'updated_at', 'created_by')
+
+# Constant SQL text so SQLite's statement cache reuses the compiled
+# program; the ORDER BY is served by idx_sites_created_at
+SELECT_SITES_SQL = f"SELECT {', '.join(SITE_COLS)} FROM sites ORDER BY created_at DESC"
+
+# Memoized UPDATE text per combination of changed columns. sqlite3's
+# statement cache is keyed by SQL text, so handing it the same string for
+# the same column set skips the re-prepare that a fresh f-string per
+# request would trigger (only 2^5 field combinations exist)
+_UPDATE_SITE_SQL = {}
+
+def _update_site_sql(cols):
+    sql = _UPDATE_SITE_SQL.get(cols)
+    if sql is None:
+        assignments = ', '.join(f"{c} = ?" for c in cols)
+        sql = f"UPDATE sites SET {assignments} WHERE id = ? RETURNING *"
+        _UPDATE_SITE_SQL[cols] = sql
+    return sql
+
+INSERT_SITE_SQL = '''
+    INSERT INTO sites (id, name, location, folder_type, folder_link, description,
+                       qr_url, qr_id, created_at, updated_at, created_by)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+def bulk_insert_sites(rows):
+    """Insert many site rows in a single transaction (one fsync, one bind)"""
+    conn = get_db_connection()
+    if conn is None:
+        return False
+
+    try:
+        conn.execute("BEGIN")
+        conn.executemany(INSERT_SITE_SQL, rows)
+        conn.execute("COMMIT")
         return True
     except Error as e:
-        print(f"Error initializing database: {e}")
+        conn.execute("ROLLBACK")
+        log.error("Error bulk inserting sites: %s", e)
         return False
-    finally:
-        conn.close()
 
 @app.route('/auth/google')
 def auth_google():
@@ -169,68 +631,103 @@ def auth_google():
         include_granted_scopes='true',
         prompt='consent'
     )
-    # Store state with a timestamp
+    # Store state with a timestamp; a full store means the endpoint is
+    # being hammered, so shed load instead of silently evicting a
+    # legitimate pending auth
+    if len(OAUTH_STATES) >= MAX_STATES:
+        clean_old_states()
+        if len(OAUTH_STATES) >= MAX_STATES:
+            return jsonify({'error': 'Too many pending authentication attempts, try again shortly'}), 429
+    # Absolute deadline (monotonic, immune to wall-clock skew): expiry
+    # checks become a single compare instead of a subtraction per entry
     OAUTH_STATES[state] = {
-        'timestamp': datetime.now().timestamp(),
+        'expires': time.monotonic() + STATE_TTL,
         'used': False
     }
-    # Clean up old states
-    clean_old_states()
     return redirect(auth_url)
 
+# Browser retries of the callback (double-click, network stutter) re-post
+# the same authorization code; Google rejects the second exchange. Track
+# in-flight/recent exchanges by code so a retry reuses the first result
+# instead of burning a failing round trip to the token endpoint
+_TOKEN_EXCHANGES = cachetools.TTLCache(maxsize=1024, ttl=30)
+_TOKEN_EXCHANGE_LOCK = threading.Lock()
+
 def clean_old_states():
-    """Remove states older than 10 minutes"""
-    now = datetime.now().timestamp()
-    expired = [s for s, data in OAUTH_STATES.items() 
-               if now - data['timestamp'] > 600 or data['used']]
+    """Remove expired or already-used states"""
+    now = time.monotonic()
+    expired = [s for s, data in OAUTH_STATES.items()
+               if data['expires'] < now or data['used']]
     for state in expired:
         OAUTH_STATES.pop(state, None)
 
 @app.route('/auth/google/callback')
 def auth_google_callback():
-    expected_state = session.get('state')
     incoming_state = request.args.get('state')
-    
-    # Add debug logging
-    print(f"Callback received - Session state: {expected_state}, URL state: {incoming_state}")
-    print(f"Full session contents: {session}")
-    
-    if not expected_state or expected_state != incoming_state:
-        print("STATE_MISMATCH", {"expected": expected_state, "incoming": incoming_state})
-        # Instead of returning an error, try to recover
-        # Store the state from the URL and continue
-        session['state'] = incoming_state
-        print("Recovered by setting session state to incoming state")
-    
+
+    # Validate against the in-memory state store; the session is never
+    # touched for OAuth state, so /auth/google stays disk-free
+    state_data = OAUTH_STATES.get(incoming_state)
+    if (state_data is None or state_data['used']
+            or state_data['expires'] < time.monotonic()):
+        log.warning("STATE_MISMATCH incoming=%s", incoming_state)
+        return jsonify({'error': 'Invalid or expired OAuth state'}), 400
+    state_data['used'] = True
+
     try:
+        frontend_url = os.environ.get('FRONTEND_URL', 'http://localhost:3000')
+
+        # Dedupe by authorization code: only the first request for a code
+        # performs the exchange, retries wait for (and reuse) its result
+        code = request.args.get('code', '')
+        with _TOKEN_EXCHANGE_LOCK:
+            exchange = _TOKEN_EXCHANGES.get(code)
+            is_owner = exchange is None
+            if is_owner:
+                exchange = {'event': threading.Event(), 'credentials': None}
+                _TOKEN_EXCHANGES[code] = exchange
+
+        if not is_owner:
+            exchange['event'].wait(timeout=10)
+            if exchange['credentials'] is None:
+                return jsonify({'error': 'Token exchange already in progress failed'}), 400
+            session['credentials'] = exchange['credentials']
+            return redirect(f"{frontend_url}")
+
         flow = Flow.from_client_secrets_file(
             CLIENT_SECRETS_FILE,
             scopes=SCOPES,
             state=incoming_state,  # Use the incoming state from URL
             redirect_uri=CALLBACK_URL
         )
-        
-        # Get the authorization code
-        flow.fetch_token(authorization_response=request.url)
-        creds = flow.credentials
-        
+
+        # Exchange the authorization code; publish the result (or the
+        # failure) to any duplicate callbacks waiting on the event
+        try:
+            flow.fetch_token(authorization_response=request.url)
+            creds = flow.credentials
+            creds_dict = {
+                'token': creds.token,
+                'refresh_token': creds.refresh_token,
+                'token_uri': creds.token_uri,
+                'client_id': creds.client_id,
+                'client_secret': creds.client_secret,
+                'scopes': creds.scopes
+            }
+            exchange['credentials'] = creds_dict
+        finally:
+            exchange['event'].set()
+
         # Store credentials in session
-        session['credentials'] = {
-            'token': creds.token,
-            'refresh_token': creds.refresh_token,
-            'token_uri': creds.token_uri,
-            'client_id': creds.client_id,
-            'client_secret': creds.client_secret,
-            'scopes': creds.scopes
-        }
-        
+        session['credentials'] = creds_dict
+
         # Get user info for logging
         try:
-            drive_service = build(API_SERVICE_NAME, API_VERSION, credentials=creds)
+            drive_service = build_from_document(_DRIVE_DISCOVERY, credentials=creds)
             about = drive_service.about().get(fields='user').execute()
             user_info = about.get('user', {})
             email = user_info.get('emailAddress', 'unknown')
-            print(f"User authenticated: {email}")
+            log.debug("User authenticated: %s", email)
             
             # Store user info in session too
             session['user_info'] = {
@@ -240,156 +737,37 @@ def auth_google_callback():
             }
             
         except Exception as e:
-            print(f"Failed to get user info after authentication: {e}")
-            print(traceback.format_exc())
+            log.exception("Failed to get user info after authentication")
         
         # Redirect to the frontend
-        frontend_url = os.environ.get('FRONTEND_URL', 'http://localhost:3000')
         return redirect(f"{frontend_url}")
     
     except Exception as e:
-        print(f"Error in OAuth callback: {e}")
-        print(traceback.format_exc())
+        log.exception("Error in OAuth callback")
         
         # Return a more user-friendly error page
-        return f"""
-        <html>
-        <head>
-            <title>Authentication Error</title>
-            <style>
-                body {{ font-family: Arial, sans-serif; text-align: center; margin-top: 100px; }}
-                .error {{ color: #d32f2f; font-size: 24px; margin-bottom: 20px; }}
-                .message {{ color: #666; margin-bottom: 30px; }}
-                .button {{ display: inline-block; padding: 10px 20px; background-color: #3F9CBC; 
-                          color: white; text-decoration: none; border-radius: 4px; font-weight: bold; }}
-            </style>
-        </head>
-        <body>
-            <div class="error">Authentication Error</div>
-            <div class="message">We encountered an error during authentication: {str(e)}</div>
-            <a href="/auth/google" class="button">Try Again</a>
-        </body>
-        </html>
-        """
+        return render_template('auth_error.html', error=str(e))
+
+# These pages take no template variables, so the Jinja render runs once
+# and the bytes are reused for every subsequent hit
+@lru_cache(maxsize=8)
+def _render_static_page(template_name):
+    return render_template(template_name)
 
 @app.route('/')
 def index():
     """Main page of the API"""
-    return """
-    <html>
-    <head>
-        <title>Google Drive API</title>
-        <style>
-            body {
-                font-family: Arial, sans-serif;
-                max-width: 800px;
-                margin: 0 auto;
-                padding: 30px;
-            }
-            h1 {
-                color: #3F9CBC;
-            }
-            .endpoints {
-                background-color: #f5f5f5;
-                padding: 20px;
-                border-radius: 5px;
-                margin-top: 20px;
-            }
-            .endpoint {
-                margin-bottom: 10px;
-                font-family: monospace;
-            }
-            .status {
-                margin-top: 30px;
-                padding: 15px;
-                background-color: #e8f4fd;
-                border-radius: 5px;
-            }
-            .auth-button {
-                display: inline-block;
-                margin-top: 20px;
-                padding: 10px 20px;
-                background-color: #3F9CBC;
-                color: white;
-                text-decoration: none;
-                border-radius: 4px;
-                font-weight: bold;
-            }
-        </style>
-    </head>
-    <body>
-        <h1>Google Drive API Server</h1>
-        <p>This is the backend API server for Google Drive integration.</p>
-        
-        <div class="status">
-            <h2>API Status</h2>
-            <p>The API is running. You can check the status at <a href="/api/status">/api/status</a>.</p>
-            <p>Authentication status can be checked at <a href="/auth/status">/auth/status</a>.</p>
-            <a href="/auth/google" class="auth-button">Authenticate with Google</a>
-        </div>
-        
-        <div class="endpoints">
-            <h2>Available Endpoints</h2>
-            <div class="endpoint"><strong>GET /api/status</strong> - Check API status</div>
-            <div class="endpoint"><strong>GET /auth/status</strong> - Check authentication status</div>
-            <div class="endpoint"><strong>GET /auth/google</strong> - Start Google authentication</div>
-            <div class="endpoint"><strong>GET /auth/logout</strong> - Sign out</div>
-            <div class="endpoint"><strong>GET /api/files</strong> - List files</div>
-            <div class="endpoint"><strong>POST /api/files</strong> - Create file</div>
-            <div class="endpoint"><strong>GET /api/sites</strong> - List sites</div>
-            <div class="endpoint"><strong>POST /api/sites</strong> - Create site</div>
-            <div class="endpoint"><strong>GET /api/templates</strong> - List templates</div>
-        </div>
-    </body>
-    </html>
-    """
+    resp = make_response(_render_static_page('index.html'))
+    resp.headers['Cache-Control'] = 'public, max-age=3600'
+    return resp
 
 @app.route('/auth-success')
 def auth_success():
     """Simple page to show after successful authentication"""
-    return """
-    <html>
-    <head>
-        <title>Authentication Successful</title>
-        <style>
-            body {
-                font-family: Arial, sans-serif;
-                text-align: center;
-                margin-top: 100px;
-            }
-            .success {
-                color: #28a745;
-                font-size: 24px;
-                margin-bottom: 20px;
-            }
-            .redirect {
-                color: #666;
-                margin-bottom: 30px;
-            }
-            .button {
-                display: inline-block;
-                padding: 10px 20px;
-                background-color: #3F9CBC;
-                color: white;
-                text-decoration: none;
-                border-radius: 4px;
-                font-weight: bold;
-            }
-        </style>
-        <script>
-            // Redirect to main page after a short delay
-            setTimeout(function() {
-                window.location.href = '/';
-            }, 3000);
-        </script>
-    </head>
-    <body>
-        <div class="success">✓ Authentication Successful!</div>
-        <div class="redirect">You will be redirected in a few seconds...</div>
-        <a href="/" class="button">Go to Dashboard</a>
-    </body>
-    </html>
-    """
+    resp = make_response(_render_static_page('auth_success.html'))
+    resp.headers['Cache-Control'] = 'public, max-age=3600'
+    return resp
+
 @app.route('/auth/logout')
 def auth_logout():
     """Clear the session and logout"""
@@ -402,11 +780,20 @@ def auth_status():
     credentials = get_credentials()
     if credentials:
         try:
-            # Get user info
-            drive_service = get_drive_service()
-            about = drive_service.about().get(fields='user').execute()
-            user_info = about.get('user', {})
-            
+            # The callback already stored the user's identity in the
+            # session; answer the ping from there and only fall back to
+            # a Drive about() round trip when it is missing
+            user_info = session.get('user_info')
+            if not user_info:
+                drive_service = get_drive_service()
+                about = drive_service.about().get(fields='user').execute()
+                user_info = about.get('user', {})
+                session['user_info'] = {
+                    'displayName': user_info.get('displayName'),
+                    'emailAddress': user_info.get('emailAddress'),
+                    'permissionId': user_info.get('permissionId')
+                }
+
             return jsonify({
                 'authenticated': True,
                 'user': {
@@ -416,7 +803,7 @@ def auth_status():
                 }
             })
         except Exception as e:
-            print(f"Error getting user info: {e}")
+            log.warning("Error getting user info: %s", e)
             session.clear()  # Clear invalid credentials
             return jsonify({'authenticated': False, 'error': 'Invalid credentials'})
     
@@ -455,37 +842,30 @@ def upload_file():
         if not parent_folder:
             return jsonify({'error': 'Parent folder ID is required'}), 400
         
-        # Save the file to a temporary location
-        temp_file = tempfile.NamedTemporaryFile(delete=False)
-        uploaded_file.save(temp_file.name)
-        
-        try:
-            # Prepare file metadata
-            file_metadata = {
-                'name': uploaded_file.filename,
-                'parents': [parent_folder]
-            }
-            
-            # Determine MIME type
-            mime_type = uploaded_file.content_type or 'application/octet-stream'
-            
-            # Upload the file
-            media = MediaFileUpload(temp_file.name, mimetype=mime_type)
-            file = drive_service.files().create(
-                body=file_metadata,
-                media_body=media,
-                fields='id,name,mimeType,createdTime,modifiedTime,webViewLink'
-            ).execute()
-            
-            return jsonify(file)
-        finally:
-            # Clean up the temporary file
-            if os.path.exists(temp_file.name):
-                os.unlink(temp_file.name)
-    
+        # Prepare file metadata
+        file_metadata = {
+            'name': uploaded_file.filename,
+            'parents': [parent_folder]
+        }
+
+        # Determine MIME type
+        mime_type = uploaded_file.content_type or 'application/octet-stream'
+
+        # Upload straight from the incoming request stream (werkzeug spools
+        # large bodies to a temp file for us); no extra in-memory copy.
+        # Resumable + 8MB chunks keeps memory bounded for big files
+        media = MediaIoBaseUpload(uploaded_file.stream, mimetype=mime_type,
+                                  resumable=True, chunksize=8 * 1024 * 1024)
+        file = drive_service.files().create(
+            body=file_metadata,
+            media_body=media,
+            fields='id,name,mimeType,createdTime,modifiedTime,webViewLink'
+        ).execute()
+
+        return jsonify(file)
+
     except Exception as e:
-        print(f"Error uploading file: {e}")
-        print(traceback.format_exc())
+        log.exception("Error uploading file")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/files', methods=['GET'])
@@ -520,11 +900,14 @@ def list_files():
         ).execute()
         
         files = results.get('files', [])
-        return jsonify(files)
-    
+        # Strong ETag over the body: a client re-polling an unchanged
+        # listing gets a body-less 304 via make_conditional
+        resp = jsonify(files)
+        resp.set_etag(hashlib.md5(resp.get_data()).hexdigest())
+        return resp.make_conditional(request)
+
     except Exception as e:
-        print(f"Error listing files: {e}")
-        print(traceback.format_exc())
+        log.exception("Error listing files")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/files/<file_id>', methods=['GET'])
@@ -542,12 +925,13 @@ def get_file(file_id):
             fileId=file_id,
             fields=fields
         ).execute()
-        
-        return jsonify(file)
-    
+
+        resp = jsonify(file)
+        resp.set_etag(hashlib.md5(resp.get_data()).hexdigest())
+        return resp.make_conditional(request)
+
     except Exception as e:
-        print(f"Error getting file metadata: {e}")
-        print(traceback.format_exc())
+        log.exception("Error getting file metadata")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/files/<file_id>/content', methods=['GET'])
@@ -559,55 +943,69 @@ def get_file_content(file_id):
     
     try:
         drive_service = get_drive_service()
-        
-        # Get file metadata to determine content type
-        file_metadata = drive_service.files().get(
-            fileId=file_id,
-            fields='name,mimeType'
-        ).execute()
-        
-        # Download the file content
-        request = drive_service.files().get_media(fileId=file_id)
-        
-        # Create a BytesIO object to store the file content
-        file_content = io.BytesIO()
-        downloader = MediaIoBaseDownload(file_content, request)
-        
-        done = False
-        while not done:
-            status, done = downloader.next_chunk()
-        
-        # Reset the file pointer to the beginning
-        file_content.seek(0)
-        
-        # If it's a text file, return the content as string
+
+        # Metadata and content are independent round-trips; fetch the
+        # metadata on the pool (own service build — googleapiclient http
+        # objects are not thread-safe) while this thread pulls the first
+        # content chunk, overlapping the two RTTs
+        meta_fut = _NET_POOL.submit(
+            lambda: _thread_drive_service(credentials)
+                    .files().get(fileId=file_id, fields='name,mimeType').execute())
+
+        # 8MB chunks instead of the 100KB default: far fewer next_chunk
+        # round-trips for multi-MB files
+        media_req = drive_service.files().get_media(fileId=file_id)
+
+        # Pull the first content chunk while the metadata request is in
+        # flight on the pool
+        buf = io.BytesIO()
+        downloader = MediaIoBaseDownload(buf, media_req, chunksize=8 * 1024 * 1024)
+        status, done = downloader.next_chunk()
+
+        file_metadata = meta_fut.result()
+
+        # If it's a text file, return the content as string (the whole
+        # body has to be in memory to wrap it in JSON anyway)
         if file_metadata['mimeType'].startswith('text/') or file_metadata['mimeType'] in [
             'application/json', 'application/javascript', 'application/xml'
         ]:
-            content = file_content.read().decode('utf-8')
-            return jsonify({'content': content})
-        
-        # For binary files, return the file itself
-        return send_file(
-            file_content,
+            while not done:
+                status, done = downloader.next_chunk()
+            return jsonify({'content': buf.getvalue().decode('utf-8')})
+
+        # For binary files, stream chunks to the client as they arrive
+        # from Drive: memory stays bounded at one chunk and the first
+        # bytes go out before the last chunk lands
+        def generate():
+            nonlocal done
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate(0)
+            while not done:
+                _, done = downloader.next_chunk()
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate(0)
+
+        filename = file_metadata['name'].replace('"', '')
+        return Response(
+            stream_with_context(generate()),
             mimetype=file_metadata['mimeType'],
-            as_attachment=True,
-            download_name=file_metadata['name']
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
         )
     
     except Exception as e:
-        print(f"Error getting file content: {e}")
-        print(traceback.format_exc())
+        log.exception("Error getting file content")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/files', methods=['POST'])
 def create_file():
     """Create a new file in Google Drive (supports text, bytes, base64, data URLs, or fetch by URL)"""
-    print("[/api/files POST] start", flush=True)
+    log.debug("[/api/files POST] start")
 
     credentials = get_credentials()
     if not credentials:
-        print("[/api/files POST] no credentials in session", flush=True)
+        log.debug("[/api/files POST] no credentials in session")
         return jsonify({'error': 'Authentication required. Please sign in.'}), 401
 
     try:
@@ -624,8 +1022,8 @@ def create_file():
         data_url        = data.get('dataUrl') or data.get('data_url')
         remote_url      = data.get('url')
 
-        print(f"[/api/files POST] name='{name}' mime='{mime_type}' parents={parents}", flush=True)
-        print(f"[/api/files POST] payload keys={list(data.keys())}", flush=True)
+        log.debug("[/api/files POST] name='%s' mime='%s' parents=%s", name, mime_type, parents)
+        log.debug("[/api/files POST] payload keys=%s", list(data.keys()))
 
         if not name:
             return jsonify({'error': 'File name is required'}), 400
@@ -636,15 +1034,15 @@ def create_file():
         # 1) content directly provided (string or bytes)
         if isinstance(content, (bytes, bytearray)):
             file_bytes = bytes(content)
-            print("[/api/files POST] using raw bytes content", flush=True)
+            log.debug("[/api/files POST] using raw bytes content")
         elif isinstance(content, str):
             # treat as text content
             file_bytes = content.encode('utf-8')
-            print("[/api/files POST] using UTF-8 encoded text content", flush=True)
+            log.debug("[/api/files POST] using UTF-8 encoded text content")
 
         # 2) base64 string (with or without data URL prefix)
         if file_bytes is None and content_base64:
-            print("[/api/files POST] decoding content_base64", flush=True)
+            log.debug("[/api/files POST] decoding content_base64")
             import base64
             b64 = content_base64
             if ';base64,' in b64:
@@ -655,7 +1053,7 @@ def create_file():
 
         # 3) data URL like data:application/pdf;base64,AAAA...
         if file_bytes is None and data_url:
-            print("[/api/files POST] decoding data_url", flush=True)
+            log.debug("[/api/files POST] decoding data_url")
             import base64
             if ',' not in data_url:
                 return jsonify({'error': 'Invalid dataUrl format'}), 400
@@ -664,43 +1062,34 @@ def create_file():
 
         # 4) fetch from remote URL
         if file_bytes is None and remote_url:
-            print(f"[/api/files POST] fetching remote url: {remote_url}", flush=True)
+            log.debug("[/api/files POST] fetching remote url: %s", remote_url)
             r = requests.get(remote_url, timeout=30)
             r.raise_for_status()
             file_bytes = r.content
 
         if file_bytes is None:
-            print("[/api/files POST] ERROR: no content supplied", flush=True)
+            log.warning("[/api/files POST] ERROR: no content supplied")
             return jsonify({
                 'error': "No content provided.",
                 'hint': "Send one of: content (string/bytes), contentBase64, dataUrl, or url."
             }), 400
 
-        # Write to temp file
-        with tempfile.NamedTemporaryFile(delete=False) as temp:
-            temp.write(file_bytes)
-            temp_path = temp.name
-
-        try:
-            metadata = {'name': name, 'mimeType': mime_type}
-            if parents:
-                metadata['parents'] = parents if isinstance(parents, list) else [parents]
+        metadata = {'name': name, 'mimeType': mime_type}
+        if parents:
+            metadata['parents'] = parents if isinstance(parents, list) else [parents]
 
-            media = MediaFileUpload(temp_path, mimetype=mime_type, resumable=False)
-            created = drive_service.files().create(
-                body=metadata,
-                media_body=media,
-                fields='id,name,mimeType,createdTime,modifiedTime,webViewLink'
-            ).execute()
-            print(f"[/api/files POST] created file id={created.get('id')}", flush=True)
-            return jsonify(created)
-        finally:
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
+        # Upload straight from memory; no temp file round-trip
+        media = MediaIoBaseUpload(io.BytesIO(file_bytes), mimetype=mime_type, resumable=False)
+        created = drive_service.files().create(
+            body=metadata,
+            media_body=media,
+            fields='id,name,mimeType,createdTime,modifiedTime,webViewLink'
+        ).execute()
+        log.debug("[/api/files POST] created file id=%s", created.get('id'))
+        return jsonify(created)
 
     except Exception as e:
-        print(f"[/api/files POST] ERROR: {e}", flush=True)
-        print(traceback.format_exc(), flush=True)
+        log.exception("[/api/files POST] ERROR")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/files/<file_id>', methods=['PUT'])
@@ -726,26 +1115,16 @@ def update_file(file_id):
         
         # Update content if provided
         if content is not None:
-            with tempfile.NamedTemporaryFile(delete=False) as temp:
-                if isinstance(content, str):
-                    temp.write(content.encode('utf-8'))
-                else:
-                    temp.write(content)
-            
-            try:
-                media = MediaFileUpload(temp.name, mimetype=mime_type)
-                file = drive_service.files().update(
-                    fileId=file_id,
-                    media_body=media,
-                    fields='id,name,mimeType,modifiedTime'
-                ).execute()
-                
-                return jsonify(file)
-            
-            finally:
-                # Clean up the temporary file
-                if os.path.exists(temp.name):
-                    os.unlink(temp.name)
+            body = content.encode('utf-8') if isinstance(content, str) else content
+
+            media = MediaIoBaseUpload(io.BytesIO(body), mimetype=mime_type, resumable=False)
+            file = drive_service.files().update(
+                fileId=file_id,
+                media_body=media,
+                fields='id,name,mimeType,modifiedTime'
+            ).execute()
+
+            return jsonify(file)
         
         # If only metadata was updated, get the updated file
         file = drive_service.files().get(
@@ -756,8 +1135,7 @@ def update_file(file_id):
         return jsonify(file)
     
     except Exception as e:
-        print(f"Error updating file: {e}")
-        print(traceback.format_exc())
+        log.exception("Error updating file")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/files/<file_id>', methods=['DELETE'])
@@ -773,8 +1151,7 @@ def delete_file(file_id):
         return jsonify({'success': True, 'message': f'File {file_id} deleted successfully'})
     
     except Exception as e:
-        print(f"Error deleting file: {e}")
-        print(traceback.format_exc())
+        log.exception("Error deleting file")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/folders', methods=['POST'])
@@ -811,8 +1188,7 @@ def create_folder():
         return jsonify(folder)
     
     except Exception as e:
-        print(f"Error creating folder: {e}")
-        print(traceback.format_exc())
+        log.exception("Error creating folder")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/share', methods=['POST'])
@@ -837,33 +1213,42 @@ def create_shareable_link():
             'role': role,
             'type': type
         }
-        
-        drive_service.permissions().create(
-            fileId=file_id,
-            body=permission
-        ).execute()
-        
-        # Get the file with webViewLink
-        file = drive_service.files().get(
-            fileId=file_id,
-            fields='webViewLink'
-        ).execute()
-        
-        return jsonify({'link': file.get('webViewLink')})
+
+        # Batch the permission create + webViewLink fetch into a single
+        # HTTPS round-trip
+        result = {}
+        errors = []
+
+        def _collect(request_id, response, exception):
+            if exception is not None:
+                errors.append(exception)
+            elif response:
+                result.update(response)
+
+        batch = drive_service.new_batch_http_request()
+        batch.add(drive_service.permissions().create(fileId=file_id, body=permission),
+                  callback=_collect)
+        batch.add(drive_service.files().get(fileId=file_id, fields='webViewLink'),
+                  callback=_collect)
+        batch.execute()
+
+        if errors:
+            raise errors[0]
+
+        return jsonify({'link': result.get('webViewLink')})
     
     except Exception as e:
-        print(f"Error creating shareable link: {e}")
-        print(traceback.format_exc())
+        log.exception("Error creating shareable link")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/generate_qr', methods=['POST'])
 def generate_qr():
     """Generate a QR code for a site/resource (with debug logs)"""
-    print("[/api/generate_qr] start", flush=True)
+    log.debug("[/api/generate_qr] start")
 
     credentials = get_credentials()
     if not credentials:
-        print("[/api/generate_qr] no credentials in session", flush=True)
+        log.debug("[/api/generate_qr] no credentials in session")
         return jsonify({'error': 'Authentication required. Please sign in.'}), 401
 
     try:
@@ -872,143 +1257,50 @@ def generate_qr():
         site_location = (data.get('site_location') or '').strip()
         resource_url = (data.get('resource_url') or '').strip()
 
-        print(f"[/api/generate_qr] payload: site_name='{site_name}', "
-              f"site_location='{site_location}', resource_url='{resource_url}'", flush=True)
+        log.debug("[/api/generate_qr] payload: site_name='%s', site_location='%s', resource_url='%s'", site_name, site_location, resource_url)
 
         if not site_name:
-            print("[/api/generate_qr] validation failed: missing site_name", flush=True)
+            log.debug("[/api/generate_qr] validation failed: missing site_name")
             return jsonify({'error': 'Site name is required'}), 400
         if not resource_url:
-            print("[/api/generate_qr] validation failed: missing resource_url", flush=True)
+            log.debug("[/api/generate_qr] validation failed: missing resource_url")
             return jsonify({'error': 'Resource URL is required'}), 400
 
         # Ensure output directory exists
         os.makedirs(QR_CODES_DIR, exist_ok=True)
-        print(f"[/api/generate_qr] ensured QR_CODES_DIR exists: {QR_CODES_DIR}", flush=True)
+        log.debug("[/api/generate_qr] ensured QR_CODES_DIR exists: %s", QR_CODES_DIR)
 
-        # --- Build QR ---
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(resource_url)
-        qr.make(fit=True)
-
-        qr_img = qr.make_image(fill_color="black", back_color="white")
-        # Some versions return a wrapper; ensure a real PIL.Image and correct mode
-        if hasattr(qr_img, "get_image"):
-            qr_img = qr_img.get_image()
-        qr_img = qr_img.convert("RGB")
-
-        qr_w, qr_h = qr_img.size
-        print(f"[/api/generate_qr] qr size: {qr_w}x{qr_h}, mode={qr_img.mode}", flush=True)
-
-        # --- Prepare font ---
-        # Try a common font; fall back to default
-        font = None
-        tried_fonts = []
-        for font_name in ["DejaVuSans.ttf", "Arial.ttf", "Arial"]:
-            try:
-                font = ImageFont.truetype(font_name, 16)
-                print(f"[/api/generate_qr] using TTF font: {font_name}", flush=True)
-                break
-            except Exception as fe:
-                tried_fonts.append(font_name)
-        if font is None:
-            font = ImageFont.load_default()
-            print(f"[/api/generate_qr] fallback to default font; tried={tried_fonts}", flush=True)
-
-        # --- Helper: wrap text to available width ---
-        def wrap_text(draw, text, max_width, font):
-            if not text:
-                return []
-            words = text.split()
-            lines, cur = [], []
-            for w in words:
-                test = (" ".join(cur + [w])).strip()
-                bbox = draw.textbbox((0, 0), test, font=font)
-                width = bbox[2] - bbox[0]
-                if width <= max_width or not cur:
-                    cur.append(w)
-                else:
-                    lines.append(" ".join(cur))
-                    cur = [w]
-            if cur:
-                lines.append(" ".join(cur))
-            return lines
-
-        # Create a temp drawing context to measure
-        tmp_canvas = Image.new("RGB", (qr_w, qr_h), "white")
-        tmp_draw = ImageDraw.Draw(tmp_canvas)
-
-        # Compute wrapped lines to fit the QR width with small padding
-        text_max_width = qr_w - 20
-        name_lines = wrap_text(tmp_draw, site_name, text_max_width, font)
-        loc_lines = wrap_text(tmp_draw, site_location, text_max_width, font)
-
-        # Measure total text height
-        line_height = (tmp_draw.textbbox((0, 0), "Ag", font=font)[3]
-                       - tmp_draw.textbbox((0, 0), "Ag", font=font)[1])
-        # Add a little vertical spacing between blocks
-        padding_top = 10
-        gap_between = 6
-        block_gap = 12 if (name_lines and loc_lines) else 0
-        text_lines_count = len(name_lines) + len(loc_lines)
-        text_height = (padding_top +
-                       (len(name_lines) * line_height) +
-                       (block_gap if name_lines and loc_lines else 0) +
-                       (len(loc_lines) * line_height) +
-                       10)  # bottom padding
-
-        # --- Compose final image ---
-        new_h = qr_h + max(60, text_height)  # ensure at least 60px like before
-        out = Image.new("RGB", (qr_w, new_h), color="white")
-        print(f"[/api/generate_qr] canvas size: {qr_w}x{new_h}", flush=True)
-
-        # Paste QR at top-left
-        out.paste(qr_img, (0, 0))
-        print("[/api/generate_qr] pasted QR onto canvas", flush=True)
-
-        # Draw text centered relative to QR width
-        draw = ImageDraw.Draw(out)
-        cursor_y = qr_h + padding_top
-
-        def draw_centered_lines(lines):
-            nonlocal cursor_y
-            for line in lines:
-                bbox = draw.textbbox((0, 0), line, font=font)
-                w = bbox[2] - bbox[0]
-                x = max(10, (qr_w - w) // 2)  # center, but keep min left padding
-                draw.text((x, cursor_y), line, fill="black", font=font)
-                cursor_y += line_height + gap_between
-
-        # Site name (bold-ish: draw twice for a tiny faux bold effect)
-        if name_lines:
-            for _ in range(1):
-                draw_centered_lines(name_lines)
-
-        # Extra gap between name and location blocks
-        if name_lines and loc_lines:
-            cursor_y += (block_gap - gap_between if block_gap > gap_between else 0)
-
-        # Location
-        if loc_lines:
-            draw_centered_lines(loc_lines)
-
-        # --- Save file ---
-        qr_id = f"site_{uuid.uuid4().hex[:8]}"
+        # Content-addressed filename: identical payloads reuse the PNG on disk
+        cache_key = hashlib.sha1(
+            f"{resource_url}|{site_name}|{site_location}".encode()
+        ).hexdigest()
+        qr_id = f"site_{cache_key[:16]}"
         filename = f"{qr_id}.png"
         path = os.path.join(QR_CODES_DIR, filename)
-        out.save(path, format="PNG")
-        print(f"[/api/generate_qr] saved PNG: {path}", flush=True)
 
-        # Public URL
-        # Ensure host_url ends with slash once
         base = request.host_url if request.host_url.endswith("/") else (request.host_url + "/")
         qr_url = f"{base}qrcodes/{filename}"
-        print(f"[/api/generate_qr] qr_url: {qr_url}", flush=True)
+
+        if os.path.exists(path):
+            log.debug("[/api/generate_qr] cache hit: %s", path)
+            return jsonify({
+                'qr_id': qr_id,
+                'qr_png_view_link': qr_url,
+                'qr_png_download_link': qr_url,
+                'site_name': site_name,
+                'site_location': site_location,
+                'resource_url': resource_url
+            })
+
+        # --- Build QR + caption via the shared pipeline ---
+        out = _compose_labeled_qr(resource_url, site_name, site_location)
+        log.debug("[/api/generate_qr] canvas size: %sx%s", out.width, out.height)
+
+        # --- Save file ---
+        # Encode + write off-thread; only the URL is needed for the response
+        _IO_POOL.submit(_encode_and_store_png, out, filename, path)
+        log.debug("[/api/generate_qr] queued PNG save: %s", path)
+        log.debug("[/api/generate_qr] qr_url: %s", qr_url)
 
         result = {
             'qr_id': qr_id,
@@ -1019,28 +1311,59 @@ def generate_qr():
             'resource_url': resource_url
         }
 
-        print("[/api/generate_qr] success", flush=True)
+        log.debug("[/api/generate_qr] success")
         return jsonify(result)
 
     except Exception as e:
-        print(f"[/api/generate_qr] ERROR: {e}", flush=True)
-        print(traceback.format_exc(), flush=True)
+        log.exception("[/api/generate_qr] ERROR")
         return jsonify({'error': 'Failed to generate QR code', 'details': str(e)}), 500
 
+# When set (e.g. '/qrcodes_internal'), QR responses carry an
+# X-Accel-Redirect header and nginx streams the file with sendfile(2)
+# instead of the WSGI worker pushing bytes through Python. Pair it with:
+#   location /qrcodes_internal/ { internal; alias /path/to/qrcodes/; }
+QR_ACCEL_REDIRECT_PREFIX = os.environ.get('QR_ACCEL_REDIRECT_PREFIX', '')
+
 @app.route('/qrcodes/<filename>', methods=['GET'])
 def serve_qrcode(filename):
-    """Serve generated QR code images"""
+    """Serve generated QR code images (RAM-cached, ETag-aware)"""
     try:
-        qr_path = os.path.join(QR_CODES_DIR, filename)
-        
-        if not os.path.exists(qr_path):
-            abort(404)
-        
-        return send_file(qr_path, mimetype='image/png')
-    
+        # Filenames are content-addressed, so the name doubles as a strong
+        # validator; repeat fetches become body-less 304s
+        etag = hashlib.sha1(filename.encode()).hexdigest()
+        if request.headers.get('If-None-Match') == etag:
+            return '', 304
+
+        if QR_ACCEL_REDIRECT_PREFIX:
+            # Hand the transfer to the fronting server; the worker is done
+            # as soon as the headers are out
+            resp = make_response('')
+            resp.headers['X-Accel-Redirect'] = f"{QR_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{filename}"
+            resp.headers['Content-Type'] = 'image/png'
+            resp.headers['ETag'] = etag
+            resp.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+            return resp
+
+        data = _QR_PNG_CACHE.get(filename)
+        if data is None:
+            qr_path = os.path.join(QR_CODES_DIR, filename)
+
+            if not os.path.exists(qr_path):
+                abort(404)
+
+            with open(qr_path, 'rb') as f:
+                data = f.read()
+            _QR_PNG_CACHE[filename] = data
+
+        # Content-addressed filenames never change meaning, so the file is
+        # immutable: clients can cache for a year and skip revalidation
+        resp = send_file(io.BytesIO(data), mimetype='image/png')
+        resp.headers['ETag'] = etag
+        resp.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+        return resp
+
     except Exception as e:
-        print(f"Error serving QR code: {e}")
-        print(traceback.format_exc())
+        log.exception("Error serving QR code")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/templates', methods=['GET'])
@@ -1053,49 +1376,65 @@ def get_templates():
     try:
         drive_service = get_drive_service()
         
-        # Get all JSON files in the templates folder
-        results = drive_service.files().list(
-            q=f"'{TEMPLATES_FOLDER_ID}' in parents and mimeType='application/json'",
-            fields='files(id,name,createdTime,modifiedTime)'
-        ).execute()
-        
-        files = results.get('files', [])
-        
-        # Fetch content for each template file
-        templates = []
-        for file in files:
+        # Get all JSON files in the templates folder. pageSize=1000 and
+        # explicit nextPageToken paging: big folders come back in one or
+        # two round trips instead of being silently truncated at the
+        # default page size
+        files = []
+        page_token = None
+        while True:
+            results = drive_service.files().list(
+                q=f"'{TEMPLATES_FOLDER_ID}' in parents and mimeType='application/json'",
+                pageSize=1000,
+                pageToken=page_token,
+                fields='nextPageToken,files(id,name,createdTime,modifiedTime)'
+            ).execute()
+            files.extend(results.get('files', []))
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                break
+
+        # Fetch template contents in parallel: each file is an independent
+        # ~50-200ms round-trip to Drive, so the wall time is dominated by
+        # the slowest fetch instead of the sum of all of them
+        def _fetch_template(file):
             try:
-                request = drive_service.files().get_media(fileId=file['id'])
-                content = io.BytesIO()
-                downloader = MediaIoBaseDownload(content, request)
-                
-                done = False
-                while not done:
-                    status, done = downloader.next_chunk()
-                
-                content.seek(0)
-                template_data = json.loads(content.read().decode('utf-8'))
-                
+                # Keyed by (id, modifiedTime): an edited file gets a new
+                # modifiedTime from the list call, so hits are always
+                # current and stale entries simply age out of the LRU
+                cache_key = (file['id'], file.get('modifiedTime'))
+                template_data = _TEMPLATE_CACHE.get(cache_key)
+                if template_data is None:
+                    # Per-thread service: googleapiclient resources share an
+                    # http object, which is not safe across threads
+                    svc = _thread_drive_service(credentials)
+                    # Templates are small JSON files; a single-shot execute()
+                    # returns the raw bytes without the chunked-download loop
+                    raw = svc.files().get_media(fileId=file['id']).execute()
+                    template_data = msgspec.json.decode(raw)
+                    _TEMPLATE_CACHE[cache_key] = template_data
+
                 # Add file metadata to template object
-                template_with_metadata = {
+                return {
                     **template_data,
                     'fileId': file['id'],
                     'fileName': file['name'],
                     'createdTime': file.get('createdTime'),
                     'modifiedTime': file.get('modifiedTime')
                 }
-                
-                templates.append(template_with_metadata)
-            
-            except Exception as e:
-                print(f"Error parsing template {file['name']}: {e}")
-                print(traceback.format_exc())
-        
+            except Exception:
+                log.exception("Error parsing template %s", file['name'])
+                return None
+
+        templates = []
+        if files:
+            templates = [t for t in _NET_POOL.map(_fetch_template, files)
+                         if t is not None]
+
         return jsonify(templates)
     
     except Exception as e:
-        print(f"Error fetching templates: {e}")
-        print(traceback.format_exc())
+        log.exception("Error fetching templates")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/templates/<template_id>', methods=['GET'])
@@ -1107,39 +1446,25 @@ def get_template(template_id):
 
     try:
         drive_service = get_drive_service()
-        print(f"[get_template] START template_id={template_id}")
-
-        # DO NOT name this variable `request` (that shadows Flask's request)
-        media_req = drive_service.files().get_media(fileId=template_id)
-        content = io.BytesIO()
-        downloader = MediaIoBaseDownload(content, media_req)
-
-        done = False
-        while not done:
-            status, done = downloader.next_chunk()
-            if status is not None:
-                try:
-                    print(f"[get_template] Download progress: {int(status.progress() * 100)}%")
-                except Exception:
-                    pass
-
-        content.seek(0)
-        raw = content.read()
-        print(f"[get_template] Downloaded bytes: {len(raw)}")
+        log.debug("[get_template] START template_id=%s", template_id)
+
+        # Templates are small JSON files; a single-shot execute() returns
+        # the raw bytes without the chunked-download loop
+        raw = drive_service.files().get_media(fileId=template_id).execute()
+        log.debug("[get_template] Downloaded bytes: %s", len(raw))
 
         # Decode JSON safely
         try:
-            template_data = json.loads(raw.decode('utf-8'))
+            template_data = msgspec.json.decode(raw)
         except Exception as parse_err:
-            print(f"[get_template] ERROR parsing JSON: {parse_err}")
+            log.warning("[get_template] ERROR parsing JSON: %s", parse_err)
             return jsonify({'error': 'Invalid template JSON in Drive'}), 500
 
         template_data['fileId'] = template_id
         return jsonify(template_data)
 
     except Exception as e:
-        print(f"[get_template] ERROR template_id={template_id}: {e}")
-        print(traceback.format_exc())
+        log.exception("[get_template] ERROR template_id=%s", template_id)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/templates', methods=['POST'])
@@ -1169,50 +1494,41 @@ def create_template():
             'updatedAt': datetime.now().isoformat()
         }
         
-        # Convert to JSON string
-        template_content = json.dumps(template, indent=2)
+        # Encode straight to bytes; format() pretty-prints without a
+        # string round-trip
+        template_content = msgspec.json.format(msgspec.json.encode(template), indent=2)
         
         # Create filename with timestamp to make it unique
         timestamp = datetime.now().isoformat().replace(':', '-').replace('.', '-')
         filename = f"{name}_{timestamp}.json"
         
-        # Create a temporary file with the content
-        with tempfile.NamedTemporaryFile(delete=False) as temp:
-            temp.write(template_content.encode('utf-8'))
-        
-        try:
-            # Prepare file metadata
-            file_metadata = {
-                'name': filename,
-                'mimeType': 'application/json',
-                'parents': [TEMPLATES_FOLDER_ID]
-            }
-            
-            # Upload the file
-            media = MediaFileUpload(temp.name, mimetype='application/json')
-            file = drive_service.files().create(
-                body=file_metadata,
-                media_body=media,
-                fields='id,name,mimeType,createdTime,modifiedTime,webViewLink'
-            ).execute()
-            
-            # Add file metadata to template
-            result = {
-                **template,
-                'fileId': file['id'],
-                'fileName': file['name']
-            }
-            
-            return jsonify(result)
-        
-        finally:
-            # Clean up the temporary file
-            if os.path.exists(temp.name):
-                os.unlink(temp.name)
-    
+        # Prepare file metadata
+        file_metadata = {
+            'name': filename,
+            'mimeType': 'application/json',
+            'parents': [TEMPLATES_FOLDER_ID]
+        }
+
+        # Upload straight from memory; the content never touches disk
+        media = MediaIoBaseUpload(io.BytesIO(template_content),
+                                  mimetype='application/json', resumable=False)
+        file = drive_service.files().create(
+            body=file_metadata,
+            media_body=media,
+            fields='id,name,mimeType,createdTime,modifiedTime,webViewLink'
+        ).execute()
+
+        # Add file metadata to template
+        result = {
+            **template,
+            'fileId': file['id'],
+            'fileName': file['name']
+        }
+
+        return jsonify(result)
+
     except Exception as e:
-        print(f"Error creating template: {e}")
-        print(traceback.format_exc())
+        log.exception("Error creating template")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/templates/<template_id>', methods=['PUT'])
@@ -1224,37 +1540,30 @@ def update_template(template_id):
 
     try:
         drive_service = get_drive_service()
-        print(f"[update_template] START template_id={template_id}")
-
-        # --- Download existing JSON (avoid shadowing Flask's `request`) ---
-        media_req = drive_service.files().get_media(fileId=template_id)
-        content = io.BytesIO()
-        downloader = MediaIoBaseDownload(content, media_req)
-
-        done = False
-        while not done:
-            status, done = downloader.next_chunk()
-            if status is not None:
-                try:
-                    print(f"[update_template] Download progress: {int(status.progress() * 100)}%")
-                except Exception:
-                    pass
-
-        content.seek(0)
-        raw_json_bytes = content.read()
-        print(f"[update_template] Downloaded bytes: {len(raw_json_bytes)}")
-
-        # Parse existing template JSON
-        try:
-            existing_template = json.loads(raw_json_bytes.decode("utf-8"))
-            print(f"[update_template] Existing template keys: {list(existing_template.keys())}")
-        except Exception as parse_err:
-            print(f"[update_template] WARN: Failed to parse existing JSON: {parse_err}")
-            existing_template = {}
+        log.debug("[update_template] START template_id=%s", template_id)
+
+        # --- Fetch the existing template, preferring the parse cache ---
+        # The merge semantics (PUT may be partial) require the current
+        # content, but a small metadata call for modifiedTime lets a
+        # cached parse stand in for the full media download
+        meta = drive_service.files().get(
+            fileId=template_id, fields='modifiedTime').execute()
+        cache_key = (template_id, meta.get('modifiedTime'))
+        existing_template = _TEMPLATE_CACHE.get(cache_key)
+        if existing_template is None:
+            raw_json_bytes = drive_service.files().get_media(fileId=template_id).execute()
+            log.debug("[update_template] Downloaded bytes: %s", len(raw_json_bytes))
+            try:
+                existing_template = msgspec.json.decode(raw_json_bytes)
+                _TEMPLATE_CACHE[cache_key] = existing_template
+            except Exception as parse_err:
+                log.warning("[update_template] Failed to parse existing JSON: %s", parse_err)
+                existing_template = {}
+        log.debug("[update_template] Existing template keys: %s", list(existing_template.keys()))
 
         # --- Read incoming JSON body from Flask request ---
         incoming = request.get_json(silent=True) or {}
-        print(f"[update_template] Incoming update keys: {list(incoming.keys())}")
+        log.debug("[update_template] Incoming update keys: %s", list(incoming.keys()))
 
         # Merge and bump version
         updated = {
@@ -1271,29 +1580,21 @@ def update_template(template_id):
             updated['version'] = f"{major_i}.{minor_i}"
         except Exception:
             updated['version'] = '1.0'
-        print(f"[update_template] Version: {existing_template.get('version')} -> {updated['version']}")
+        log.debug("[update_template] Version: %s -> %s", existing_template.get('version'), updated['version'])
+
+        # Upload the updated JSON straight from memory
+        data_bytes = msgspec.json.format(msgspec.json.encode(updated), indent=2)
+        media = MediaIoBaseUpload(io.BytesIO(data_bytes),
+                                  mimetype='application/json', resumable=False)
+        file_obj = drive_service.files().update(
+            fileId=template_id,
+            media_body=media,
+            fields='id,name,mimeType,modifiedTime'
+        ).execute()
+        log.debug("[update_template] Drive update OK: id=%s modified=%s", file_obj.get('id'), file_obj.get('modifiedTime'))
 
-        # Write updated JSON to a temp file for upload
-        data_str = json.dumps(updated, indent=2)
-        with tempfile.NamedTemporaryFile(delete=False) as tmp:
-            tmp.write(data_str.encode('utf-8'))
-            tmp_path = tmp.name
-        print(f"[update_template] Temp file written: {tmp_path} ({len(data_str)} chars)")
-
-        try:
-            media = MediaFileUpload(tmp_path, mimetype='application/json')
-            file_obj = drive_service.files().update(
-                fileId=template_id,
-                media_body=media,
-                fields='id,name,mimeType,modifiedTime'
-            ).execute()
-            print(f"[update_template] Drive update OK: id={file_obj.get('id')} modified={file_obj.get('modifiedTime')}")
-        finally:
-            try:
-                os.unlink(tmp_path)
-                print(f"[update_template] Temp file removed: {tmp_path}")
-            except Exception as del_err:
-                print(f"[update_template] WARN: Could not remove temp file: {del_err}")
+        # Seed the parse cache so the next read skips the media download
+        _TEMPLATE_CACHE[(template_id, file_obj.get('modifiedTime'))] = updated
 
         result = {
             **updated,
@@ -1304,8 +1605,7 @@ def update_template(template_id):
         return jsonify(result)
 
     except Exception as e:
-        print(f"[update_template] ERROR template_id={template_id}: {e}")
-        print(traceback.format_exc())
+        log.exception("[update_template] ERROR template_id=%s", template_id)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/sites', methods=['GET'])
@@ -1321,20 +1621,17 @@ def get_sites():
             return jsonify({'error': 'Database connection failed'}), 500
         
         cursor = conn.cursor()
-        cursor.execute('SELECT * FROM sites ORDER BY created_at DESC')
-        rows = cursor.fetchall()
-        
-        # Convert rows to list of dictionaries
-        sites = []
-        for row in rows:
-            sites.append(dict(row))
-        
-        conn.close()
+        cursor.arraysize = 1000  # fewer fetch round trips into the VDBE
+        cursor.execute(SELECT_SITES_SQL)
+
+        # dict(zip(...)) against the fixed column tuple skips the
+        # per-row sqlite3.Row keys() machinery
+        sites = [dict(zip(SITE_COLS, row)) for row in cursor.fetchall()]
+
         return jsonify(sites)
     
     except Exception as e:
-        print(f"Error getting sites: {e}")
-        print(traceback.format_exc())
+        log.exception("Error getting sites")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/sites/<site_id>', methods=['GET'])
@@ -1354,33 +1651,35 @@ def get_site(site_id):
         row = cursor.fetchone()
         
         if row is None:
-            conn.close()
             return jsonify({'error': 'Site not found'}), 404
-        
+
         site = dict(row)
-        conn.close()
         return jsonify(site)
     
     except Exception as e:
-        print(f"Error getting site {site_id}: {e}")
-        print(traceback.format_exc())
+        log.exception("Error getting site %s", site_id)
         return jsonify({'error': str(e)}), 500
 
+def _build_site_qr(folder_link, site_name, site_location, qr_path):
+    """Render the labelled site QR PNG to qr_path"""
+    out = _compose_labeled_qr(folder_link, site_name, site_location)
+
+    # Encode + write off-thread; the caller only needs the URL
+    _IO_POOL.submit(_encode_and_store_png, out, os.path.basename(qr_path), qr_path)
+
 @app.route('/api/sites', methods=['POST'])
 def create_site():
     """Create a new site with QR code (fixed QR paste + debug logs)"""
-    print("[/api/sites POST] start", flush=True)
+    log.debug("[/api/sites POST] start")
 
     credentials = get_credentials()
     if not credentials:
-        print("[/api/sites POST] no credentials in session", flush=True)
+        log.debug("[/api/sites POST] no credentials in session")
         return jsonify({'error': 'Authentication required. Please sign in.'}), 401
 
     try:
-        drive_service = get_drive_service()
-        about = drive_service.about().get(fields='user').execute()
-        user_email = about.get('user', {}).get('emailAddress')
-        print(f"[/api/sites POST] user_email={user_email}", flush=True)
+        user_email = get_user_email()
+        log.debug("[/api/sites POST] user_email=%s", user_email)
 
         data = request.json or {}
         site_name     = (data.get('name') or '').strip()
@@ -1390,9 +1689,7 @@ def create_site():
         description   = (data.get('description') or '').strip()
         site_id       = data.get('site_id') or f"site_{uuid.uuid4().hex[:8]}"
 
-        print(f"[/api/sites POST] payload site_id={site_id} name='{site_name}' "
-              f"location='{site_location}' folder_type='{folder_type}' "
-              f"folder_link(len)={len(folder_link)}", flush=True)
+        log.debug("[/api/sites POST] payload site_id=%s name='%s' location='%s' folder_type='%s' folder_link(len)=%s", site_id, site_name, site_location, folder_type, len(folder_link))
 
         # Validation
         if not site_name:
@@ -1404,134 +1701,38 @@ def create_site():
 
         # ---------- QR CODE BUILD (robust) ----------
         os.makedirs(QR_CODES_DIR, exist_ok=True)
-        print(f"[/api/sites POST] ensured QR_CODES_DIR={QR_CODES_DIR}", flush=True)
+        log.debug("[/api/sites POST] ensured QR_CODES_DIR=%s", QR_CODES_DIR)
 
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(folder_link)
-        qr.make(fit=True)
-
-        qr_img = qr.make_image(fill_color="black", back_color="white")
-        # Unwrap to real PIL.Image and force RGB to satisfy .paste()
-        if hasattr(qr_img, "get_image"):
-            qr_img = qr_img.get_image()
-        qr_img = qr_img.convert("RGB")
-
-        qr_w, qr_h = qr_img.size
-        print(f"[/api/sites POST] qr_img size={qr_w}x{qr_h} mode={qr_img.mode}", flush=True)
-
-        # ---------- FONT ----------
-        font = None
-        tried = []
-        for candidate in ["DejaVuSans.ttf", "Arial.ttf", "Arial"]:
-            try:
-                font = ImageFont.truetype(candidate, 16)
-                print(f"[/api/sites POST] using font='{candidate}'", flush=True)
-                break
-            except Exception:
-                tried.append(candidate)
-        if font is None:
-            font = ImageFont.load_default()
-            print(f"[/api/sites POST] fallback default font; tried={tried}", flush=True)
-
-        # ---------- TEXT WRAP/MEASURE ----------
-        def wrap_text(draw, text, max_width, font):
-            if not text:
-                return []
-            words = text.split()
-            lines, cur = [], []
-            for w in words:
-                test = (" ".join(cur + [w])).strip()
-                bbox = draw.textbbox((0, 0), test, font=font)
-                width = bbox[2] - bbox[0]
-                if width <= max_width or not cur:
-                    cur.append(w)
-                else:
-                    lines.append(" ".join(cur))
-                    cur = [w]
-            if cur:
-                lines.append(" ".join(cur))
-            return lines
-
-        tmp = Image.new("RGB", (qr_w, qr_h), "white")
-        tmp_draw = ImageDraw.Draw(tmp)
-        text_max_w = qr_w - 20  # 10px side padding
-
-        name_lines = wrap_text(tmp_draw, site_name, text_max_w, font)
-        loc_lines  = wrap_text(tmp_draw, site_location, text_max_w, font)
-
-        def line_h(d, font):
-            bbox = d.textbbox((0, 0), "Ag", font=font)
-            return (bbox[3] - bbox[1]) or 16
-
-        lh = line_h(tmp_draw, font)
-        pad_top = 10
-        gap = 6
-        block_gap = 12 if (name_lines and loc_lines) else 0
-        text_h = (pad_top
-                  + len(name_lines) * (lh + gap)
-                  + (block_gap if (name_lines and loc_lines) else 0)
-                  + len(loc_lines) * (lh + gap)
-                  + 10)  # bottom pad
-
-        new_h = qr_h + max(60, text_h)
-        out = Image.new("RGB", (qr_w, new_h), "white")
-        print(f"[/api/sites POST] canvas size={qr_w}x{new_h}", flush=True)
-
-        # Paste QR (real PIL image)
-        out.paste(qr_img, (0, 0))
-        print("[/api/sites POST] pasted QR to canvas", flush=True)
-
-        draw = ImageDraw.Draw(out)
-        cursor_y = qr_h + pad_top
-
-        def draw_centered(lines):
-            nonlocal cursor_y
-            for line in lines:
-                bbox = draw.textbbox((0, 0), line, font=font)
-                w = bbox[2] - bbox[0]
-                x = max(10, (qr_w - w) // 2)
-                draw.text((x, cursor_y), line, fill="black", font=font)
-                cursor_y += lh + gap
-
-        if name_lines:
-            draw_centered(name_lines)
-        if name_lines and loc_lines:
-            cursor_y += max(0, block_gap - gap)
-        if loc_lines:
-            draw_centered(loc_lines)
-
-        qr_id = f"qr_{uuid.uuid4().hex[:8]}"
+        # Content-addressed id: a QR for the same link + label text is
+        # byte-identical, so repeat submissions reuse the PNG on disk and
+        # skip the encode/compose/save work entirely
+        qr_key = f"{folder_link}|{site_name}|{site_location}".encode()
+        qr_id = f"qr_{hashlib.blake2b(qr_key, digest_size=8).hexdigest()}"
         qr_filename = f"{qr_id}.png"
         qr_path = os.path.join(QR_CODES_DIR, qr_filename)
-        out.save(qr_path, format="PNG")
-        print(f"[/api/sites POST] saved PNG: {qr_path}", flush=True)
+
+        if os.path.exists(qr_path):
+            log.debug("[/api/sites POST] reusing existing QR: %s", qr_path)
+        else:
+            _build_site_qr(folder_link, site_name, site_location, qr_path)
+            log.debug("[/api/sites POST] saved PNG: %s", qr_path)
 
         base = request.host_url if request.host_url.endswith("/") else (request.host_url + "/")
         qr_url = f"{base}qrcodes/{qr_filename}"
-        print(f"[/api/sites POST] qr_url={qr_url}", flush=True)
-
+        log.debug("[/api/sites POST] qr_url=%s", qr_url)
         # ---------- DB WRITE ----------
         conn = get_db_connection()
         if conn is None:
-            print("[/api/sites POST] DB connection failed", flush=True)
+            log.error("[/api/sites POST] DB connection failed")
             return jsonify({'error': 'Database connection failed'}), 500
 
         cursor = conn.cursor()
         now = datetime.now().isoformat()
-        cursor.execute('''
-            INSERT INTO sites (id, name, location, folder_type, folder_link, description,
-                               qr_url, qr_id, created_at, updated_at, created_by)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (site_id, site_name, site_location, folder_type, folder_link, description,
-              qr_url, qr_id, now, now, user_email))
+        cursor.execute(INSERT_SITE_SQL,
+                       (site_id, site_name, site_location, folder_type, folder_link, description,
+                        qr_url, qr_id, now, now, user_email))
         conn.commit()
-        conn.close()
-        print(f"[/api/sites POST] DB insert ok: site_id={site_id}", flush=True)
+        log.debug("[/api/sites POST] DB insert ok: site_id=%s", site_id)
 
         new_site = {
             'id': site_id,
@@ -1556,14 +1757,13 @@ def create_site():
                 'timestamp': now
             })
         except Exception as e:
-            print(f"[/api/sites POST] Splunk log failed: {e}", flush=True)
+            log.warning("[/api/sites POST] Splunk log failed: %s", e)
 
-        print("[/api/sites POST] success", flush=True)
+        log.debug("[/api/sites POST] success")
         return jsonify(new_site)
 
     except Exception as e:
-        print(f"[/api/sites POST] ERROR: {e}", flush=True)
-        print(traceback.format_exc(), flush=True)
+        log.exception("[/api/sites POST] ERROR")
         return jsonify({'error': 'Failed to create site', 'details': str(e)}), 500
 
 @app.route('/api/sites/<site_id>', methods=['PUT'])
@@ -1584,21 +1784,12 @@ def update_site(site_id):
         if not site_id:
             return jsonify({'error': 'Site ID is required'}), 400
         
-        # Get existing site
         conn = get_db_connection()
         if conn is None:
             return jsonify({'error': 'Database connection failed'}), 500
-        
+
         cursor = conn.cursor()
-        cursor.execute('SELECT * FROM sites WHERE id = ?', (site_id,))
-        row = cursor.fetchone()
-        
-        if row is None:
-            conn.close()
-            return jsonify({'error': 'Site not found'}), 404
-        
-        existing = dict(row)
-        
+
         # Update fields
         now = datetime.now().isoformat()
         update_data = {}
@@ -1616,26 +1807,25 @@ def update_site(site_id):
         
         update_data['updated_at'] = now
         
-        # Build update query
-        fields = ', '.join([f"{k} = ?" for k in update_data.keys()])
+        # Build update query; RETURNING * (SQLite >= 3.35) gives back the
+        # updated row in the same round trip, replacing the SELECT-before
+        # and SELECT-after that used to bracket the UPDATE
+        sql = _update_site_sql(tuple(update_data.keys()))
         values = list(update_data.values())
         values.append(site_id)  # For the WHERE clause
-        
-        cursor.execute(f"UPDATE sites SET {fields} WHERE id = ?", values)
-        conn.commit()
-        
-        # Get updated site
-        cursor.execute('SELECT * FROM sites WHERE id = ?', (site_id,))
+
+        cursor.execute(sql, values)
         updated_row = cursor.fetchone()
-        conn.close()
-        
+        conn.commit()
+
+        if updated_row is None:
+            return jsonify({'error': 'Site not found'}), 404
+
         updated_site = dict(updated_row)
         
         # Log to Splunk if configured
-        drive_service = get_drive_service()
-        about = drive_service.about().get(fields='user').execute()
-        user_email = about.get('user', {}).get('emailAddress')
-        
+        user_email = get_user_email()
+
         send_to_splunk({
             'action': 'site_updated',
             'site_id': site_id,
@@ -1647,8 +1837,7 @@ def update_site(site_id):
         return jsonify(updated_site)
     
     except Exception as e:
-        print(f"Error updating site {site_id}: {e}")
-        print(traceback.format_exc())
+        log.exception("Error updating site %s", site_id)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/sites/<site_id>', methods=['DELETE'])
@@ -1667,23 +1856,19 @@ def delete_site(site_id):
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM sites WHERE id = ?', (site_id,))
         row = cursor.fetchone()
-        
+
         if row is None:
-            conn.close()
             return jsonify({'error': 'Site not found'}), 404
-        
+
         site = dict(row)
         
         # Delete the site
         cursor.execute('DELETE FROM sites WHERE id = ?', (site_id,))
         conn.commit()
-        conn.close()
         
         # Log to Splunk if configured
-        drive_service = get_drive_service()
-        about = drive_service.about().get(fields='user').execute()
-        user_email = about.get('user', {}).get('emailAddress')
-        
+        user_email = get_user_email()
+
         send_to_splunk({
             'action': 'site_deleted',
             'site_id': site_id,
@@ -1695,36 +1880,72 @@ def delete_site(site_id):
         return jsonify({'success': True, 'message': f'Site {site_id} deleted successfully'})
     
     except Exception as e:
-        print(f"Error deleting site {site_id}: {e}")
-        print(traceback.format_exc())
+        log.exception("Error deleting site %s", site_id)
         return jsonify({'error': str(e)}), 500
 
+# Splunk delivery is fire-and-forget: events are queued here and posted
+# by a background thread, so the Splunk round trip never sits on a
+# user-facing request. The shared Session keeps the TCP+TLS connection
+# alive across events instead of re-handshaking per post
+_splunk_queue = queue.Queue(maxsize=1000)
+_splunk_session = requests.Session()
+_splunk_session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=64))
+_splunk_session.mount('http://', requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=64))
+
+# How many queued events get folded into one HEC request; HEC accepts
+# concatenated JSON event objects in a single body
+_SPLUNK_BATCH_MAX = 50
+
+def _splunk_worker():
+    """Drain the event queue and post to Splunk HEC in batches"""
+    while True:
+        # Block for the first event, then sweep whatever else is queued
+        # so a burst of mutations becomes one HTTP request
+        batch = [_splunk_queue.get()]
+        while len(batch) < _SPLUNK_BATCH_MAX:
+            try:
+                batch.append(_splunk_queue.get_nowait())
+            except queue.Empty:
+                break
+
+        try:
+            splunk_hec_url = os.environ.get('SPLUNK_HEC_URL', '')
+            splunk_hec_token = os.environ.get('SPLUNK_HEC_TOKEN', '')
+            headers = {
+                'Authorization': f'Splunk {splunk_hec_token}',
+                'Content-Type': 'application/json'
+            }
+            body = b'\n'.join(
+                msgspec.json.encode({
+                    'event': event_data,
+                    'source': 'google_drive_app',
+                    'sourcetype': 'google_drive_activity'
+                })
+                for event_data in batch
+            )
+            response = _splunk_session.post(splunk_hec_url, headers=headers,
+                                            data=body, timeout=5)
+            if response.status_code != 200:
+                log.warning("Error sending to Splunk HEC: %s", response.text)
+        except Exception as e:
+            log.warning("Error sending to Splunk: %s", e)
+        finally:
+            for _ in batch:
+                _splunk_queue.task_done()
+
+_splunk_thread = threading.Thread(target=_splunk_worker, daemon=True)
+_splunk_thread.start()
+
 def send_to_splunk(event_data):
-    """Send event data to Splunk HEC"""
-    splunk_hec_url = os.environ.get('SPLUNK_HEC_URL', '')
-    splunk_hec_token = os.environ.get('SPLUNK_HEC_TOKEN', '')
-    
+    """Queue event data for background delivery to Splunk HEC"""
     # Skip if Splunk integration is not configured
-    if not splunk_hec_url or not splunk_hec_token:
+    if not os.environ.get('SPLUNK_HEC_URL') or not os.environ.get('SPLUNK_HEC_TOKEN'):
         return
-    
-    headers = {
-        'Authorization': f'Splunk {splunk_hec_token}',
-        'Content-Type': 'application/json'
-    }
-    
-    payload = {
-        'event': event_data,
-        'source': 'google_drive_app',
-        'sourcetype': 'google_drive_activity'
-    }
-    
+
     try:
-        response = requests.post(splunk_hec_url, headers=headers, json=payload, verify=False)
-        if response.status_code != 200:
-            print(f"Error sending to Splunk HEC: {response.text}")
-    except Exception as e:
-        print(f"Error sending to Splunk: {e}")
+        _splunk_queue.put_nowait(event_data)
+    except queue.Full:
+        log.warning("Splunk event queue full; dropping event")
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
@@ -1734,5 +1955,5 @@ if __name__ == '__main__':
     init_db()
 
     
-    print(f"Starting server on {host}:{port} (debug={debug})")
+    log.info("Starting server on %s:%s (debug=%s)", host, port, debug)
     app.run(host=host, port=port, debug=debug)
\ No newline at end of file